@@ -3,6 +3,10 @@ from __future__ import annotations
 
 DEBUG = True
 
+# Request threads for the production server (waitress, used when DEBUG is False).
+# main.py also sizes its preflight thread pool from this (2 tasks per request).
+SERVER_THREADS = 8
+
 # =========================================================
 # OpenAI / Vector Store
 # =========================================================
@@ -10,6 +14,9 @@ OPENAI_API_KEY = ""
 MODEL = "gpt-4o"  # or another Responses-capable model you use
 VECTOR_STORE_ID = "vs_...."  # your vector store id
 
+# How long (seconds) a successful vector store check is reused before re-verifying it.
+VS_CHECK_TTL_SECONDS = 300
+
 # =========================================================
 # LLM sampling / retrieval settings (exposed in settings)
 # =========================================================
@@ -21,6 +28,9 @@ LLM_TEMPERATURE = 0.2
 LLM_TOP_P = 0.9
 LLM_TOP_K = 40  # stored for your settings UI; may be ignored depending on model/provider
 
+# Stream the model output and stop reading as soon as the JSON object is complete.
+LLM_STREAM = True
+
 # How many results file_search should consider (the tool controls retrieval internally,
 # but we keep this as a knob for future prompt strategy).
 FILE_SEARCH_HINT = {
@@ -42,6 +52,9 @@ AZURE_DEVOPS = {
 # Which field contains steps in the Azure Test Case work item
 AZURE_STEPS_FIELD = "Microsoft.VSTS.TCM.Steps"
 
+# Max number of ids accepted by POST /api/convert/batch (the whole batch runs inside one request).
+MAX_BATCH_IDS = 50
+
 # =========================================================
 # Output requirements (server-side validation only)
 # =========================================================
@@ -177,29 +190,40 @@ Quality requirements:
 - For final validation steps, use available validation keywords (isDisplayed / pageContainsText / elementExists, etc.)
   and existing objects; do not invent elements.
 """
+SYSTEM_PROMPT = SYSTEM_PROMPT.strip()
 
 # =========================================================
-# Prompt (User template)
+# Prompt (User)
 # =========================================================
+# The user message is USER_PROMPT_PREFIX (static, identical on every call) followed by
+# USER_PROMPT_TEMPLATE (per-TC data only). Keeping all static text first gives OpenAI
+# prompt caching a long stable prefix; do NOT move placeholders into the prefix.
+USER_PROMPT_PREFIX = """
+Convert the natural-language test case below to TestingOn automation.
+
+Guidance:
+- Generate a short, clear, descriptive name.
+- Expand steps as needed for automation stability.
+- Use objects/keywords ONLY from the vector store documents.
+- Ensure keyword params order follows keywords.pdf parameter1..parameterN strictly.
+- IMPORTANT: Apply the deterministic sequences from Deterministic_mapping_rules.doc exactly when they match a NL step.
+- The Azure steps JSON below must be copied into output as references.steps.
+"""
+USER_PROMPT_PREFIX = USER_PROMPT_PREFIX.strip()
+
 # main.py will inject the Azure-extracted NL steps into {tc_nl}
 USER_PROMPT_TEMPLATE = """
-Convert this natural-language test case to TestingOn automation.
-
 Natural-language TC:
 {tc_nl}
 
-Original steps (from Azure, exact order):
-
 Azure metadata (JSON):
 {tc_meta}
 
-Azure steps (JSON, original from Azure DevOps) — must be copied into output as references.steps:
+Azure steps (JSON, original from Azure DevOps, exact order) — must be copied into output as references.steps:
 {azure_steps_json}
+"""
+USER_PROMPT_TEMPLATE = USER_PROMPT_TEMPLATE.strip()
 
-Guidance:
-- Generate a short, clear, descriptive name.
-- Expand steps as needed for automation stability.
-- Use objects/keywords ONLY from the vector store documents.
-- Ensure keyword params order follows keywords.pdf parameter1..parameterN strictly.
-- IMPORTANT: Apply the deterministic sequences from Deterministic_mapping_rules.doc exactly when they match a NL step.
-"""
\ No newline at end of file
+# Send a prompt_cache_key (derived from SYSTEM_PROMPT) so repeated calls are routed to the
+# same prompt cache. Disable if your model/endpoint rejects the parameter.
+USE_PROMPT_CACHE_KEY = True
\ No newline at end of file
@@ -0,0 +1,16 @@
+# gunicorn_conf.py
+# Production server settings. Run with:
+#   gunicorn -c gunicorn_conf.py main:app
+import multiprocessing
+import os
+
+bind = f"127.0.0.1:{os.getenv('PORT', '8006')}"
+
+# Each worker is a separate process with its own caches (OpenAI client, vector store check,
+# conversion results); threads share them, so I/O waits overlap within a worker.
+workers = 2 * multiprocessing.cpu_count() + 1
+threads = 4
+worker_class = "gthread"
+
+# LLM conversions can take a while; keep well above the slowest expected request.
+timeout = 180
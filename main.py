@@ -1,21 +1,57 @@
 # main.py
 from __future__ import annotations
 
+import base64
+import concurrent.futures
+import dataclasses
+import functools
+import hashlib
 import html
+import importlib.util
 import json
 import os
 import re
-from typing import Any, Dict, List, Optional, Tuple
+import threading
+import time
+import xml.etree.ElementTree as ET
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Tuple
 
-import requests
-from flask import Flask, jsonify
-
-from openai import OpenAI
+from flask import Flask, jsonify, request
 
 import config
 
+# openai and requests are slow to import and only needed once a request is served;
+# they are imported lazily so tooling can import this module (e.g. for the parser) cheaply.
+if TYPE_CHECKING:
+    import requests
+    from openai import OpenAI
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+try:
+    from lxml import etree as lxml_etree
+except ImportError:  # optional speedup; stdlib ElementTree is used instead
+    lxml_etree = None
+
+# optional: per-stage latency histograms on /metrics. Only probed here; the package is
+# imported on first use (see _stage_metrics) to keep importing this module cheap.
+_PROMETHEUS_AVAILABLE = importlib.util.find_spec("prometheus_client") is not None
+
 app = Flask(__name__)
 
+# -------------------------
+# Precompiled patterns
+# -------------------------
+_TAG_RE = re.compile(r"<[^>]+>")
+# XML-invalid control chars (everything below 0x20 except \t, \n, \r) -> deleted by str.translate
+_CTRL_TRANSLATE = dict.fromkeys([*range(0x00, 0x09), 0x0B, 0x0C, *range(0x0E, 0x20)])
+_ENT_RE = re.compile(r"&(?!(?:lt|gt|amp|apos|quot);|#\d+;|#x[0-9A-Fa-f]+;)", re.IGNORECASE)
+_STEPS_BLOCK_RE = re.compile(r"(<steps\b.*?</steps>)", re.DOTALL | re.IGNORECASE)
+
 
 # -------------------------
 # Logging
@@ -25,6 +61,114 @@ def debug(msg: str) -> None:
         print(f"[DEBUG] {msg}")
 
 
+# -------------------------
+# Stage timings
+# -------------------------
+_STAGE_LOCAL = threading.local()
+
+_METRICS_LOCK = threading.Lock()
+_STAGE_METRICS: Optional[Tuple[Any, Any]] = None  # (CollectorRegistry, Histogram)
+
+
+def _stage_metrics() -> Optional[Tuple[Any, Any]]:
+    """
+    Lazily create the stage histogram on a private CollectorRegistry (served by /metrics).
+    A private registry also keeps a re-import/reload of this module from clashing with
+    an already registered metric. Returns None when prometheus_client is not installed.
+    """
+    global _STAGE_METRICS
+    if _STAGE_METRICS is None and _PROMETHEUS_AVAILABLE:
+        with _METRICS_LOCK:
+            if _STAGE_METRICS is None:
+                import prometheus_client
+
+                registry = prometheus_client.CollectorRegistry()
+                histogram = prometheus_client.Histogram(
+                    "converter_stage_seconds",
+                    "Time spent in each conversion stage.",
+                    ["stage"],
+                    registry=registry,
+                )
+                _STAGE_METRICS = (registry, histogram)
+    return _STAGE_METRICS
+
+
+def start_timings() -> List[Tuple[str, int]]:
+    """Start collecting stage spans for the current thread; returns the (name, elapsed_ns) list."""
+    spans: List[Tuple[str, int]] = []
+    _STAGE_LOCAL.spans = spans
+    return spans
+
+
+def stop_timings() -> None:
+    _STAGE_LOCAL.spans = None
+
+
+@contextmanager
+def stage(name: str, spans: Optional[List[Tuple[str, int]]] = None) -> Iterator[None]:
+    """
+    Time a block. The span goes to `spans` if given, else to the list started by
+    start_timings() on this thread (if any), and to the Prometheus histogram when available.
+    """
+    if spans is None:
+        spans = getattr(_STAGE_LOCAL, "spans", None)
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        elapsed_ns = time.perf_counter_ns() - start
+        if spans is not None:
+            spans.append((name, elapsed_ns))
+        metrics = _stage_metrics()
+        if metrics is not None:
+            metrics[1].labels(name).observe(elapsed_ns / 1e9)
+        debug(f"Stage {name}: {elapsed_ns / 1e6:.1f} ms")
+
+
+def run_in_stage(name: str, spans: List[Tuple[str, int]], fn: Callable[..., Any], *args: Any) -> Any:
+    # For work submitted to another thread: records into the submitting request's spans.
+    with stage(name, spans):
+        return fn(*args)
+
+
+def format_timings(spans: List[Tuple[str, int]]) -> str:
+    return ", ".join(f"{name}={elapsed_ns / 1e6:.1f}ms" for name, elapsed_ns in spans)
+
+
+# -------------------------
+# JSON helpers (orjson when installed, stdlib json otherwise)
+# -------------------------
+def loads_json(data: Any) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _json_default(obj: Any) -> Any:
+    # orjson serializes dataclasses natively; stdlib json needs this hook.
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps_json(obj: Any, pretty: bool = False) -> str:
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if pretty else 0)
+        return orjson.dumps(obj, option=option).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, indent=2 if pretty else None, default=_json_default)
+
+
+def json_response(obj: Any, status: int = 200, headers: Optional[Dict[str, str]] = None):
+    if orjson is None:
+        return jsonify(obj), status, headers or {}
+    return app.response_class(
+        orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS),
+        status=status,
+        mimetype="application/json",
+        headers=headers,
+    )
+
+
 # -------------------------
 # Validation helpers
 # -------------------------
@@ -53,112 +197,232 @@ def require_runtime_config() -> None:
         raise RuntimeError("Missing required settings: " + ", ".join(missing))
 
 
+class JsonObjectScanner:
+    """
+    Incremental, string-aware scanner for the first balanced {...} block.
+    feed() can be called with successive chunks (e.g. streamed model output);
+    once it returns True, start/end are offsets of the object in the fed text.
+    """
+
+    def __init__(self) -> None:
+        self.start: Optional[int] = None
+        self.end: Optional[int] = None
+        self._pos = 0
+        self._depth = 0
+        self._in_str = False
+        self._escaped = False
+
+    def feed(self, chunk: str) -> bool:
+        if self.end is not None:
+            return True
+
+        for ch in chunk:
+            pos = self._pos
+            self._pos += 1
+            if self.start is None:
+                if ch == "{":
+                    self.start = pos
+                    self._depth = 1
+                continue
+            if self._in_str:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_str = False
+            elif ch == '"':
+                self._in_str = True
+            elif ch == "{":
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    self.end = pos + 1
+                    return True
+        return False
+
+
+def find_json_object(text: str) -> Optional[str]:
+    """
+    Return the first balanced {...} block in text (string-aware, single linear pass),
+    or None if there is no complete object.
+    """
+    start = text.find("{")
+    if start < 0:
+        return None
+
+    scanner = JsonObjectScanner()
+    if not scanner.feed(text[start:]):
+        return None
+    return text[start:start + scanner.end]
+
+
 def extract_json_object(text: str) -> Dict[str, Any]:
     text = (text or "").strip()
 
-    # direct
-    try:
-        obj = json.loads(text)
-        if isinstance(obj, dict):
-            return obj
-        raise ValueError("Top-level JSON must be an object/dict.")
-    except Exception:
-        pass
-
-    # fallback: first {...}
-    m = re.search(r"\{.*\}", text, flags=re.DOTALL)
-    if not m:
+    # direct (the usual case: the model returned bare JSON)
+    if text.startswith("{") and text.endswith("}"):
+        try:
+            obj = loads_json(text)
+            if isinstance(obj, dict):
+                return obj
+        except ValueError:
+            pass
+
+    # fallback: first balanced {...} (e.g. JSON wrapped in a markdown fence or prose)
+    candidate = find_json_object(text)
+    if candidate is None:
         raise ValueError("No JSON object found in model output.")
-    candidate = m.group(0)
 
-    obj = json.loads(candidate)
+    obj = loads_json(candidate)
     if not isinstance(obj, dict):
         raise ValueError("Extracted JSON is not an object/dict.")
     return obj
 
 
-def ensure_step_defaults(payload: Dict[str, Any]) -> None:
+def normalize_and_validate_payload(payload: Dict[str, Any]) -> None:
     """
-    Make output robust:
-    - Fill missing step ids (1, 2, ...)
-    - Ensure 'keyword' and 'params' exist with sane defaults
-    This prevents API failures due to minor model formatting misses.
+    Validate the model output and, in the same pass over automated_steps,
+    make it robust to minor model formatting misses:
+    - Fill missing step ids (S001, S002, ...)
+    - Ensure 'keyword' and 'params' exist with sane defaults (params coerced to a list)
+    Raises ValueError on anything that cannot be repaired.
     """
-    steps = payload.get("automated_steps")
-    if not isinstance(steps, list):
-        return
-
-    for i, st in enumerate(steps, start=1):
-        if not isinstance(st, dict):
-            continue
-
-        # Fill missing id
-        if not st.get("id"):
-            st["id"] = f"S{i:03d}"
-
-        # Ensure required keys exist
-        if "keyword" not in st or st["keyword"] is None:
-            st["keyword"] = ""
-        if "params" not in st or st["params"] is None:
-            st["params"] = []
-        elif not isinstance(st["params"], list):
-            st["params"] = [st["params"]]
-
-
-def validate_payload(payload: Dict[str, Any]) -> None:
     missing = [k for k in config.REQUIRED_TOP_LEVEL_KEYS if k not in payload]
     if missing:
         raise ValueError(f"Output JSON missing required top-level keys: {missing}")
 
-
     steps = payload.get("automated_steps")
     if not isinstance(steps, list) or not steps:
         raise ValueError("Output JSON must include non-empty 'automated_steps' list.")
 
+    req_step_keys = tuple(config.REQUIRED_STEP_KEYS)
     for i, st in enumerate(steps):
         if not isinstance(st, dict):
             raise ValueError(f"AutomatedStep[{i}] must be an object.")
-        for k in config.REQUIRED_STEP_KEYS:
+
+        # Fill missing id
+        if not st.get("id"):
+            st["id"] = f"S{i + 1:03d}"
+
+        # Ensure keyword/params exist
+        if st.get("keyword") is None:
+            st["keyword"] = ""
+        params = st.get("params")
+        if params is None:
+            st["params"] = []
+        elif not isinstance(params, list):
+            st["params"] = [params]
+
+        for k in req_step_keys:
             if k not in st:
                 raise ValueError(f"AutomatedStep[{i}] missing '{k}'.")
-        if not isinstance(st.get("params"), list):
-            raise ValueError(f"AutomatedStep[{i}].params must be a list.")
 
 
 # -------------------------
 # Azure DevOps
 # -------------------------
+@functools.lru_cache(maxsize=1)
+def azure_session() -> requests.Session:
+    """
+    Shared session: keeps TCP/TLS connections alive across requests instead of
+    opening a new one per work item fetch. Created on first use.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    session = requests.Session()
+    session.mount(
+        "https://",
+        HTTPAdapter(
+            pool_connections=32,
+            pool_maxsize=32,
+            # raise_on_status=False: after the last retry return the response so the
+            # caller still reports the Azure status code and body.
+            # respect_retry_after_header=False: Azure's Retry-After on 429/503 can be long and
+            # those sleeps are not covered by the request timeout; use the short backoff instead.
+            max_retries=Retry(
+                total=2,
+                backoff_factor=0.2,
+                status_forcelist=[429, 502, 503, 504],
+                raise_on_status=False,
+                respect_retry_after_header=False,
+            ),
+        ),
+    )
+    return session
+
+
+@functools.lru_cache(maxsize=4)
 def azure_auth_header(pat: str) -> Dict[str, str]:
     # Azure DevOps uses Basic auth with PAT as password and empty username.
-    import base64
+    # Cached: treat the returned dict as read-only.
     token = base64.b64encode(f":{pat}".encode("utf-8")).decode("utf-8")
     return {"Authorization": f"Basic {token}"}
 
 
-def fetch_azure_testcase_workitem(tc_id: int) -> Dict[str, Any]:
-    az = config.AZURE_DEVOPS
-    org = az["org"]
-    project = az["project"]
-    base_url = az.get("base_url", "https://dev.azure.com").rstrip("/")
-    api_version = az.get("api_version", "7.1-preview.3")
-
-    url = f"{base_url}/{org}/{project}/_apis/wit/workitems/{tc_id}"
-    params = {"api-version": api_version, "$expand": "fields"}
-
+@functools.lru_cache(maxsize=4)
+def _azure_request_parts(
+    org: str, project: str, base_url: str, api_version: str, pat: str
+) -> Tuple[str, Dict[str, str], Dict[str, str]]:
+    # Built once per Azure settings; returns (workitems base url, headers, params), all read-only.
+    base = f"{base_url.rstrip('/')}/{org}/{project}/_apis/wit/workitems"
     headers = {
-        **azure_auth_header(az["pat"]),
+        **azure_auth_header(pat),
         "Accept": "application/json",
+        "Accept-Encoding": "gzip, deflate",
     }
+    params = {"api-version": api_version, "$expand": "fields"}
+    return base, headers, params
+
+
+def fetch_azure_testcase_workitem(tc_id: int) -> Dict[str, Any]:
+    az = config.AZURE_DEVOPS
+    base, headers, params = _azure_request_parts(
+        az["org"],
+        az["project"],
+        az.get("base_url", "https://dev.azure.com"),
+        az.get("api_version", "7.1-preview.3"),
+        az["pat"],
+    )
 
     debug(f"Fetching Azure work item {tc_id} ...")
-    r = requests.get(url, headers=headers, params=params, timeout=30)
+    r = azure_session().get(f"{base}/{tc_id}", headers=headers, params=params, timeout=30)
     if r.status_code != 200:
         raise RuntimeError(f"Azure fetch failed ({r.status_code}): {r.text}")
 
-    return r.json()
+    return loads_json(r.content)
+
+
+# lxml parsers should not be shared between threads; keep one of each kind per thread.
+_LXML_PARSER_LOCAL = threading.local()
+
+
+def _lxml_parser(recover: bool):
+    attr = "recovering" if recover else "strict"
+    parser = getattr(_LXML_PARSER_LOCAL, attr, None)
+    if parser is None:
+        parser = lxml_etree.XMLParser(
+            recover=recover,
+            resolve_entities=False,
+            huge_tree=False,
+            remove_comments=True,
+            remove_pis=True,
+        )
+        setattr(_LXML_PARSER_LOCAL, attr, parser)
+    return parser
 
 
-def parse_steps_from_tcm_field(steps_field_value: str) -> List[Dict[str, str]]:
+@dataclasses.dataclass(slots=True)
+class AzureStep:
+    """One Azure Test Case step, already cleaned (plain text, whitespace collapsed)."""
+    action: str
+    expected: str
+
+
+def parse_steps_from_tcm_field(steps_field_value: str) -> List[AzureStep]:
     """
     Robust Azure DevOps Test Case steps parser.
     Handles:
@@ -166,38 +430,33 @@ def parse_steps_from_tcm_field(steps_field_value: str) -> List[Dict[str, str]]:
       - steps stored as HTML-escaped XML
       - undefined HTML entities (&nbsp; etc.) that break XML parsers
       - HTML tags embedded inside parameterizedString (use itertext)
-    Returns list of {action, expected}.
+    Uses lxml (strict, then recovering as a last resort) when installed, stdlib ElementTree otherwise.
+    Returns list of AzureStep(action, expected); steps with neither are dropped.
     """
     if not steps_field_value:
         return []
 
-    import xml.etree.ElementTree as ET
-    import html as _html
-    import re as _re
-
     def _clean(x: str) -> str:
         x = x or ""
-        x = _html.unescape(x)
-        # remove HTML tags and normalize whitespace
-        x = _re.sub(r"<[^>]+>", " ", x)
-        x = _re.sub(r"\s+", " ", x).strip()
-        return x
+        x = html.unescape(x)
+        # remove HTML tags; split()/join collapses and trims whitespace in C
+        return " ".join(_TAG_RE.sub(" ", x).split())
 
     def _sanitize_for_xml(s: str) -> str:
         # Remove control chars
-        s = _re.sub(r"[\x00-\x08\x0B\x0C\x0E-\x1F]", "", s)
+        s = s.translate(_CTRL_TRANSLATE)
 
         # Escape non-XML entities
-        s = _re.sub(
-            r"&(?!(lt|gt|amp|apos|quot);|#\d+;|#x[0-9A-Fa-f]+;)",
-            "&amp;",
-            s,
-            flags=_re.IGNORECASE
-        )
+        s = _ENT_RE.sub("&amp;", s)
         return s
 
-    def _try_parse(xml_text: str) -> Optional[ET.Element]:
+    def _try_parse(xml_text: str, recover: bool = False) -> Optional[Any]:
+        # Returns an ElementTree or lxml element (same find/iterfind/itertext API), or None
         try:
+            if lxml_etree is not None:
+                return lxml_etree.fromstring(xml_text.encode("utf-8"), parser=_lxml_parser(recover))
+            if recover:
+                return None
             return ET.fromstring(xml_text)
         except Exception:
             return None
@@ -209,18 +468,23 @@ def parse_steps_from_tcm_field(steps_field_value: str) -> List[Dict[str, str]]:
 
     # Strategy B: if escaped or failed, unescape + sanitize + parse
     if root is None or "&lt;steps" in raw.lower():
-        unescaped = _html.unescape(raw)
-        m = _re.search(r"(<steps\b.*?</steps>)", unescaped, flags=_re.DOTALL | _re.IGNORECASE)
+        unescaped = html.unescape(raw)
+        m = _STEPS_BLOCK_RE.search(unescaped)
         xml_blob = m.group(1) if m else unescaped
         xml_blob = _sanitize_for_xml(xml_blob)
         root = _try_parse(xml_blob)
 
+        # Strategy C (lxml only): salvage what we can from still-broken markup.
+        # Last resort because recovery silently drops stray characters (e.g. a bare '&').
+        if root is None:
+            root = _try_parse(xml_blob, recover=True)
+
     if root is None:
         return []
 
-    out: List[Dict[str, str]] = []
+    out: List[AzureStep] = []
 
-    for step in root.findall(".//step"):
+    for step in root.iterfind(".//step"):
         ps = step.findall("./parameterizedString")
 
         def text_of(elem) -> str:
@@ -235,41 +499,24 @@ def parse_steps_from_tcm_field(steps_field_value: str) -> List[Dict[str, str]]:
         expected = _clean(expected_raw)
 
         if action or expected:
-            out.append({"action": action, "expected": expected})
+            out.append(AzureStep(action, expected))
 
     return out
 
 
-def compile_nl_tc_from_azure(tc_id: int, wi: Dict[str, Any]) -> Tuple[str, Dict[str, Any], List[Dict[str, str]]]:
+def compile_nl_tc_from_azure(tc_id: int, wi: Dict[str, Any]) -> Tuple[str, Dict[str, Any], List[AzureStep]]:
     fields = wi.get("fields", {}) or {}
     title = fields.get("System.Title", f"Azure TC {tc_id}")
 
     steps_field = fields.get(config.AZURE_STEPS_FIELD, "") or ""
-    steps = parse_steps_from_tcm_field(steps_field)
-
     # Build:
     # - azure_steps_structured: exact extracted steps (action/expected) in order
+    #   (the parser already cleans the text and drops empty steps)
     # - tc_nl: TEST_CASE_NL-like string (one action per line) used as conversion input
-    azure_steps_structured: List[Dict[str, str]] = []
-    lines: List[str] = []
-
-    for s in steps:
-        a = (s.get("action") or "").strip()
-        e = (s.get("expected") or "").strip()
-
-        if not a and not e:
-            continue
-
-        azure_steps_structured.append({
-            "action": a,
-            "expected": e
-        })
-
-        # Conversion input: keep it close to your original TEST_CASE_NL style (actions only)
-        if a:
-            lines.append(a)
+    azure_steps_structured = parse_steps_from_tcm_field(steps_field)
 
-    tc_nl = "".join([ln for ln in lines if ln]).strip()
+    # Conversion input: keep it close to your original TEST_CASE_NL style (actions only, one per line)
+    tc_nl = "\n".join(s.action for s in azure_steps_structured if s.action)
 
     tc_meta = {
         "azure_tc_id": tc_id,
@@ -284,6 +531,23 @@ def compile_nl_tc_from_azure(tc_id: int, wi: Dict[str, Any]) -> Tuple[str, Dict[
 # -------------------------
 # OpenAI conversion
 # -------------------------
+_CACHE_LOCK = threading.Lock()
+_CLIENT_CACHE: Dict[str, OpenAI] = {}
+_VS_CHECK_CACHE: Dict[Tuple[str, str], float] = {}
+
+
+def get_openai_client(api_key: str) -> OpenAI:
+    # One client per api_key: reuses the underlying HTTP connection pool across requests.
+    with _CACHE_LOCK:
+        client = _CLIENT_CACHE.get(api_key)
+        if client is None:
+            from openai import OpenAI
+
+            client = OpenAI(api_key=api_key)
+            _CLIENT_CACHE[api_key] = client
+    return client
+
+
 def check_vector_store(client: OpenAI) -> None:
     debug(f"Checking vector store: {config.VECTOR_STORE_ID}")
     client.vector_stores.retrieve(config.VECTOR_STORE_ID)
@@ -294,47 +558,122 @@ def check_vector_store(client: OpenAI) -> None:
     debug(f"Vector store OK. Files found (sample): {len(files)}")
 
 
-def build_user_prompt(tc_nl: str, tc_meta: Dict[str, Any], azure_steps: List[Dict[str, str]]) -> str:
-    return config.USER_PROMPT_TEMPLATE.format(
+def check_vector_store_cached(client: OpenAI) -> None:
+    """
+    Same as check_vector_store, but skips the network round-trips if the
+    (api_key, VECTOR_STORE_ID) pair was verified less than VS_CHECK_TTL_SECONDS ago.
+    Failed checks are not cached.
+    """
+    key = (client.api_key, config.VECTOR_STORE_ID)
+    ttl = getattr(config, "VS_CHECK_TTL_SECONDS", 300)
+
+    with _CACHE_LOCK:
+        checked_at = _VS_CHECK_CACHE.get(key)
+    if checked_at is not None and time.monotonic() - checked_at < ttl:
+        debug(f"Vector store check cached: {config.VECTOR_STORE_ID}")
+        return
+
+    check_vector_store(client)
+    with _CACHE_LOCK:
+        _VS_CHECK_CACHE[key] = time.monotonic()
+
+
+_PROMPT_CACHE_KEY = hashlib.sha1(config.SYSTEM_PROMPT.encode("utf-8")).hexdigest()[:16]
+
+
+@functools.lru_cache(maxsize=4)
+def _base_create_kwargs(
+    model: str, vector_store_id: str, temperature: float, top_p: float, use_prompt_cache_key: bool
+) -> Dict[str, Any]:
+    # Invariant part of the Responses API call, built once per settings combination.
+    # Shared between calls: treat as read-only.
+    kwargs: Dict[str, Any] = {
+        "model": model,
+        "tools": [{"type": "file_search", "vector_store_ids": [vector_store_id]}],
+        "temperature": temperature,
+        "top_p": top_p,
+    }
+    if use_prompt_cache_key:
+        kwargs["extra_body"] = {"prompt_cache_key": _PROMPT_CACHE_KEY}
+    return kwargs
+
+
+def build_user_prompt(tc_nl: str, tc_meta: Dict[str, Any], azure_steps: List[AzureStep]) -> str:
+    # Static instructions first, per-TC data last: keeps the prompt-cacheable prefix stable.
+    # Prompts are already stripped in config.py.
+    return config.USER_PROMPT_PREFIX + "\n\n" + config.USER_PROMPT_TEMPLATE.format(
         tc_nl=tc_nl.strip(),
-        azure_steps_json=json.dumps(azure_steps, ensure_ascii=False, indent=2),
-        tc_meta=json.dumps(tc_meta, ensure_ascii=False, indent=2),
-    ).strip()
+        azure_steps_json=dumps_json(azure_steps, pretty=True),
+        tc_meta=dumps_json(tc_meta, pretty=True),
+    )
 
 
-def run_conversion(client: OpenAI, tc_nl: str, tc_meta: Dict[str, Any], azure_steps: List[Dict[str, str]]) -> Dict[str, Any]:
-    tools = [{"type": "file_search", "vector_store_ids": [config.VECTOR_STORE_ID]}]
+def stream_output_text(client: OpenAI, create_kwargs: Dict[str, Any]) -> str:
+    """
+    Stream the Responses API output and return the text as soon as the first
+    JSON object in it is complete, without waiting for the rest of the stream.
+    """
+    chunks: List[str] = []
+    scanner = JsonObjectScanner()
 
+    stream = client.responses.create(**create_kwargs, stream=True)
+    try:
+        for event in stream:
+            etype = getattr(event, "type", "")
+            if etype == "response.output_text.delta":
+                delta = event.delta or ""
+                chunks.append(delta)
+                if scanner.feed(delta):
+                    debug("JSON object complete; closing stream early")
+                    break
+            elif etype in ("response.failed", "response.incomplete", "error"):
+                resp = getattr(event, "response", None)
+                detail = getattr(resp, "error", None) or getattr(event, "message", None) or etype
+                raise RuntimeError(f"OpenAI streaming failed: {detail}")
+    finally:
+        stream.close()
+
+    return "".join(chunks)
+
+
+def run_conversion(client: OpenAI, tc_nl: str, tc_meta: Dict[str, Any], azure_steps: List[AzureStep]) -> Dict[str, Any]:
+    base_kwargs = _base_create_kwargs(
+        config.MODEL,
+        config.VECTOR_STORE_ID,
+        config.LLM_TEMPERATURE,
+        config.LLM_TOP_P,
+        bool(getattr(config, "USE_PROMPT_CACHE_KEY", False)),
+    )
     create_kwargs: Dict[str, Any] = {
-        "model": config.MODEL,
+        **base_kwargs,
         "input": [
-            {"role": "system", "content": config.SYSTEM_PROMPT.strip()},
+            {"role": "system", "content": config.SYSTEM_PROMPT},
             {"role": "user", "content": build_user_prompt(tc_nl, tc_meta, azure_steps)},
         ],
-        "tools": tools,
-        "temperature": config.LLM_TEMPERATURE,
-        "top_p": config.LLM_TOP_P,
     }
 
     # top_k may be ignored; keep config for your settings UI
     if getattr(config, "LLM_TOP_K", None) is not None:
         debug("Note: LLM_TOP_K is set in config, but may be ignored (not supported by OpenAI Responses API).")
 
-    debug("Calling OpenAI Responses API...")
-    resp = client.responses.create(**create_kwargs)
+    with stage("llm"):
+        if getattr(config, "LLM_STREAM", False):
+            debug("Calling OpenAI Responses API (streaming)...")
+            output_text = stream_output_text(client, create_kwargs)
+        else:
+            debug("Calling OpenAI Responses API...")
+            resp = client.responses.create(**create_kwargs)
+            output_text = getattr(resp, "output_text", None) or str(resp)
 
-    output_text = getattr(resp, "output_text", None) or str(resp)
+    with stage("json_parse"):
+        payload = extract_json_object(output_text)
 
-    payload = extract_json_object(output_text)
-
-    # Ensure missing step ids / keys are repaired before validation
-    ensure_step_defaults(payload)
     # Merge Azure steps (action/expected) into references.steps without overwriting existing references
     refs = payload.get("references")
     if not isinstance(refs, dict):
         refs = {}
     # Preserve existing references fields and add/overwrite only references["steps"]
-    refs["steps"] = list(azure_steps)
+    refs["steps"] = [{"action": s.action, "expected": s.expected} for s in azure_steps]
     payload["references"] = refs
 
     # Remove any accidental schema-meta fields (required keys should never be printed)
@@ -344,48 +683,201 @@ def run_conversion(client: OpenAI, tc_nl: str, tc_meta: Dict[str, Any], azure_st
     # Remove any top-level azure_steps (we only keep them under references.steps)
     payload.pop("azure_steps", None)
 
-    validate_payload(payload)
+    # Repair missing step ids / keys and validate in a single pass
+    with stage("validate"):
+        normalize_and_validate_payload(payload)
     return payload
 
 
+# -------------------------
+# Conversion result cache
+# -------------------------
+# lru_cache needs hashable args, so the per-request conversion inputs are handed
+# to _convert_cached through a thread-local instead of as arguments.
+_CONVERT_CTX = threading.local()
+
+
+@functools.lru_cache(maxsize=512)
+def _convert_cached(tc_id: int, input_hash: str, model: str, vs_id: str) -> str:
+    ctx = _CONVERT_CTX
+    ctx.miss = True
+    payload = run_conversion(ctx.client, ctx.tc_nl, ctx.tc_meta, ctx.azure_steps)
+    return dumps_json(payload)
+
+
+def convert_with_cache(
+    client: OpenAI,
+    tc_id: int,
+    steps_field_value: str,
+    tc_nl: str,
+    tc_meta: Dict[str, Any],
+    azure_steps: List[AzureStep],
+) -> Dict[str, Any]:
+    """
+    Return the converted payload for a TC, reusing the previous result when the
+    conversion input (Azure steps field + TC metadata such as title/url), model
+    and vector store are unchanged.
+    Each call returns a fresh dict, so callers may mutate it freely.
+    """
+    hasher = hashlib.sha1(steps_field_value.encode("utf-8"))
+    hasher.update(b"\0")
+    hasher.update(dumps_json(tc_meta).encode("utf-8"))
+    input_hash = hasher.hexdigest()
+
+    ctx = _CONVERT_CTX
+    ctx.client, ctx.tc_nl, ctx.tc_meta, ctx.azure_steps = client, tc_nl, tc_meta, azure_steps
+    ctx.miss = False
+    try:
+        cached = _convert_cached(tc_id, input_hash, config.MODEL, config.VECTOR_STORE_ID)
+    finally:
+        ctx.client = ctx.tc_nl = ctx.tc_meta = ctx.azure_steps = None
+
+    if not ctx.miss:
+        debug(f"Conversion cache hit for TC {tc_id} (input {input_hash[:8]})")
+    return loads_json(cached)
+
+
+def clear_caches() -> None:
+    _convert_cached.cache_clear()
+    with _CACHE_LOCK:
+        _VS_CHECK_CACHE.clear()
+
+
 # -------------------------
 # API
 # -------------------------
+# Runs the independent pre-LLM steps (vector store check, Azure fetch) concurrently.
+# Each request submits 2 tasks, so size it for every server thread doing that at once.
+_SERVER_THREADS = int(getattr(config, "SERVER_THREADS", 8))
+_PREFLIGHT_POOL = concurrent.futures.ThreadPoolExecutor(
+    max_workers=2 * _SERVER_THREADS, thread_name_prefix="preflight"
+)
+
+
+def client_from_config() -> OpenAI:
+    require_runtime_config()
+    api_key = os.getenv("OPENAI_API_KEY", "").strip() or config.OPENAI_API_KEY.strip()
+    return get_openai_client(api_key)
+
+
+def convert_workitem(client: OpenAI, tc_id: int, wi: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    """
+    Convert an already fetched Azure work item.
+    Returns (body, http_status): the converted payload with 200, or an error body
+    with 400 when the TC has no readable steps.
+    """
+    with stage("compile"):
+        tc_nl, tc_meta, azure_steps = compile_nl_tc_from_azure(tc_id, wi)
+
+    fields = wi.get("fields", {}) or {}
+    steps_raw = (fields.get(config.AZURE_STEPS_FIELD) or "")
+
+    if not tc_nl.strip():
+        return {
+            "error": "Azure TC has no readable steps in Microsoft.VSTS.TCM.Steps (or parsing failed).",
+            "azure_tc_id": tc_id,
+            "azure_title": fields.get("System.Title"),
+            "steps_field_present": bool(steps_raw),
+            "steps_field_preview": steps_raw[:500],
+        }, 400
+
+    with stage("convert"):
+        return convert_with_cache(client, tc_id, steps_raw, tc_nl, tc_meta, azure_steps), 200
+
+
 @app.get("/api/convert/<int:azure_tc_id>")
 def api_convert(azure_tc_id: int):
+    spans = start_timings()
     try:
-        require_runtime_config()
+        client = client_from_config()
 
-        api_key = os.getenv("OPENAI_API_KEY", "").strip() or config.OPENAI_API_KEY.strip()
-        client = OpenAI(api_key=api_key)
+        f_vs = _PREFLIGHT_POOL.submit(run_in_stage, "vector_store_check", spans, check_vector_store_cached, client)
+        f_wi = _PREFLIGHT_POOL.submit(run_in_stage, "azure_fetch", spans, fetch_azure_testcase_workitem, azure_tc_id)
+        f_vs.result()
+        wi = f_wi.result()
 
-        check_vector_store(client)
+        body, status = convert_workitem(client, azure_tc_id, wi)
+        return json_response(body, status, {"X-Stage-Timings": format_timings(spans)})
 
-        wi = fetch_azure_testcase_workitem(azure_tc_id)
-        tc_nl, tc_meta, azure_steps = compile_nl_tc_from_azure(azure_tc_id, wi)
+    except Exception as e:
+        return json_response({"error": str(e)}, 500, {"X-Stage-Timings": format_timings(spans)})
 
-        if not tc_nl.strip():
-            fields = wi.get("fields", {}) or {}
-            steps_raw = (fields.get(config.AZURE_STEPS_FIELD) or "")
-            return jsonify({
-                "error": "Azure TC has no readable steps in Microsoft.VSTS.TCM.Steps (or parsing failed).",
-                "azure_tc_id": azure_tc_id,
-                "azure_title": fields.get("System.Title"),
-                "steps_field_present": bool(steps_raw),
-                "steps_field_preview": steps_raw[:500],
-            }), 400
+    finally:
+        stop_timings()
 
-        converted = run_conversion(client, tc_nl, tc_meta, azure_steps)
-        return jsonify(converted), 200
 
+def _convert_one(client: OpenAI, tc_id: int) -> Dict[str, Any]:
+    try:
+        wi = fetch_azure_testcase_workitem(tc_id)
+        body, _ = convert_workitem(client, tc_id, wi)
+        return body
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return {"error": str(e)}
+
+
+@app.post("/api/convert/batch")
+def api_convert_batch():
+    data = request.get_json(silent=True) or {}
+    ids = data.get("ids") if isinstance(data, dict) else None
+    if (
+        not isinstance(ids, list)
+        or not ids
+        or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids)
+    ):
+        return json_response({"error": "Body must be JSON like {\"ids\": [int, ...]} with at least one id."}, 400)
+
+    max_ids = getattr(config, "MAX_BATCH_IDS", 50)
+    if len(ids) > max_ids:
+        return json_response({"error": f"Too many ids: {len(ids)} (max {max_ids} per batch)."}, 400)
+
+    try:
+        client = client_from_config()
+        check_vector_store_cached(client)
+
+        tc_ids = list(dict.fromkeys(ids))  # dedupe, keep order
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(16, len(tc_ids))) as pool:
+            bodies = list(pool.map(lambda tc_id: _convert_one(client, tc_id), tc_ids))
+
+        return json_response({"results": {str(tc_id): body for tc_id, body in zip(tc_ids, bodies)}})
+
+    except Exception as e:
+        return json_response({"error": str(e)}, 500)
+
+
+if _PROMETHEUS_AVAILABLE:
+    @app.get("/metrics")
+    def api_metrics():
+        import prometheus_client
+
+        registry, _ = _stage_metrics()
+        return app.response_class(prometheus_client.generate_latest(registry), mimetype=prometheus_client.CONTENT_TYPE_LATEST)
+
+
+@app.get("/api/cache/clear")
+def api_cache_clear():
+    clear_caches()
+    debug("Conversion and vector store caches cleared")
+    return json_response({"cleared": True})
 
 
 def main():
     port = int(os.getenv("PORT", "8006"))
     debug(f"Starting API on port {port}")
-    app.run(host="127.0.0.1", port=port, debug=config.DEBUG)
+
+    if config.DEBUG:
+        app.run(host="127.0.0.1", port=port, debug=True)
+        return
+
+    # Production: a multi-threaded WSGI server so Azure/OpenAI waits overlap across requests.
+    # For multiple processes use gunicorn instead: gunicorn -c gunicorn_conf.py main:app
+    try:
+        from waitress import serve
+    except ImportError:
+        print("[WARN] waitress is not installed; falling back to the Flask development server.")
+        app.run(host="127.0.0.1", port=port, threaded=True)
+        return
+
+    serve(app, host="127.0.0.1", port=port, threads=_SERVER_THREADS)
 
 
 if __name__ == "__main__":